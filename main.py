@@ -1,8 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from fastapi.routing import APIRoute
-from routers import replace_word, upload_videos, extract_frames, videos_router
+from routers import replace_word, upload_videos, extract_frames, videos_router, files_router
 from routers import html_to_png
 from routers.repeat_block import router as repeat_block
 
@@ -17,14 +16,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# ✅ Montar solo frames estáticos
-app.mount("/frames", StaticFiles(directory="frames"), name="frames")
-
-# ✅ 🔥 AGREGADO: servir imágenes generadas por html-to-png
-app.mount("/generated_png", StaticFiles(directory="generated_png"), name="generated_png")
-
 # ✅ Registrar routers en orden (extract_frames antes por prioridad)
 app.include_router(extract_frames.router)
+app.include_router(files_router.router)  # /frames y /generated_png vía storage
 app.include_router(videos_router.router)  # streaming con Range
 app.include_router(replace_word.router)
 app.include_router(upload_videos.router)
@@ -1,5 +1,9 @@
 from fastapi import APIRouter, UploadFile, Form, File, HTTPException, Request
-import os, uuid, time, subprocess, math, requests, shutil
+from starlette.concurrency import run_in_threadpool
+import os, uuid, time, subprocess, requests, shutil, tempfile
+from services.storage import storage, UPLOADS, FRAMES, VIDEOS
+from services.video_probe import get_probe, forget_probe
+from services.frame_cache import frame_cache
 
 router = APIRouter(prefix="/extract_frames", tags=["Video Processing"])
 
@@ -9,75 +13,47 @@ print(f"🚀 Iniciando API Video Processor - Build {BUILD_VERSION}")
 print(f"📁 Ejecutando desde archivo: {__file__}")
 print(f"📂 Directorio actual: {os.getcwd()}")
 
-# === Directorios ===
-UPLOAD_DIR = "uploads"
-FRAMES_DIR = "frames"
-VIDEOS_DIR = "videos"
-
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-os.makedirs(FRAMES_DIR, exist_ok=True)
-os.makedirs(VIDEOS_DIR, exist_ok=True)
-
 # ==========================
 #  Funciones auxiliares
 # ==========================
-def _ffprobe_duration_seconds(path: str) -> float:
-    """Obtiene la duración del video en segundos usando ffprobe."""
+def _ffprobe_duration_seconds(filename: str) -> float:
+    """Obtiene la duración del video en segundos desde el probe cacheado."""
     print("📏 [ffprobe] Obteniendo duración del video...")
     try:
-        result = subprocess.run(
-            [
-                "ffprobe", "-v", "error",
-                "-show_entries", "format=duration",
-                "-of", "default=nk=1:nw=1", path
-            ],
-            capture_output=True, text=True, check=True
-        )
-        dur = float(result.stdout.strip())
+        dur = get_probe(filename)["duration"]
         print(f"✅ [ffprobe] Duración detectada: {dur:.2f} segundos.")
-        if not math.isfinite(dur) or dur <= 0:
-            raise ValueError("Duración inválida")
         return dur
     except Exception as e:
         print(f"❌ [ffprobe] Error al obtener duración: {e}")
         raise RuntimeError(f"No se pudo obtener la duración: {e}")
 
-def _extract_frames_ffmpeg(video_path: str, upload_id: str):
-    """Extrae 1 frame cada 5 segundos usando FFmpeg y devuelve metadatos."""
+def _extract_frames_ffmpeg(filename: str, upload_id: str):
+    """
+    Extrae 1 frame cada 5 segundos usando FFmpeg y devuelve metadatos.
+    `filename` es el nombre del video en el área de videos del storage.
+    """
     print("🎞️ [FFMPEG] Iniciando extracción de frames cada 5 segundos...")
-    duration = _ffprobe_duration_seconds(video_path)
+    duration = _ffprobe_duration_seconds(filename)
+    video_path = storage.ffmpeg_input(VIDEOS, filename)
     print(f"⏱️ [FFMPEG] Duración total del video: {duration:.2f}s")
 
     times = [t for t in range(5, int(duration) + 1, 5)]
     frame_info = []
     index = 1
+    work_dir = tempfile.mkdtemp(prefix=f"{upload_id}_frames_")
 
-    for t in times:
-        frame_name = f"{upload_id}_frame_{index:04d}.jpg"
-        frame_path = os.path.join(FRAMES_DIR, frame_name)
-        print(f"🧩 [FFMPEG] Extrayendo frame {index} en segundo {t}...")
-
-        cmd = [
-            "ffmpeg", "-y",
-            "-ss", str(t),
-            "-i", video_path,
-            "-frames:v", "1",
-            "-q:v", "2",
-            frame_path,
-            "-loglevel", "error"
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode != 0:
-            print(f"⚠️ [FFMPEG] Error extrayendo frame en t={t}s: {result.stderr.strip()}")
-            continue
-
-        print(f"✅ [FFMPEG] Frame {index} generado: {frame_path}")
-        frame_info.append({
-            "frame": frame_name,
-            "time_sec": float(t),
-            "path": f"/frames/{frame_name}"
-        })
-        index += 1
+    try:
+        for t in times:
+            frame_name = f"{upload_id}_frame_{index:04d}.jpg"
+            if _extract_one_frame(video_path, t, frame_name, work_dir):
+                frame_info.append({
+                    "frame": frame_name,
+                    "time_sec": float(t),
+                    "path": f"/frames/{frame_name}"
+                })
+                index += 1
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
 
     if not frame_info:
         print("❌ [FFMPEG] No se generó ningún frame.")
@@ -86,6 +62,30 @@ def _extract_frames_ffmpeg(video_path: str, upload_id: str):
     print(f"🎉 [FFMPEG] {len(frame_info)} frames extraídos correctamente.")
     return frame_info
 
+def _extract_one_frame(video_path: str, t: int, frame_name: str, work_dir: str) -> bool:
+    """Extrae el frame en el segundo `t` y lo guarda en el storage."""
+    # En local se escribe directo en la carpeta final; en S3 se sube después
+    frame_path = storage.local_path(FRAMES, frame_name) or os.path.join(work_dir, frame_name)
+    print(f"🧩 [FFMPEG] Extrayendo {frame_name} en segundo {t}...")
+
+    cmd = [
+        "ffmpeg", "-y",
+        "-ss", str(t),
+        "-i", video_path,
+        "-frames:v", "1",
+        "-q:v", "2",
+        frame_path,
+        "-loglevel", "error"
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"⚠️ [FFMPEG] Error extrayendo frame en t={t}s: {result.stderr.strip()}")
+        return False
+
+    storage.save_file(FRAMES, frame_name, frame_path)
+    print(f"✅ [FFMPEG] Frame generado: {frame_name}")
+    return True
+
 # ==========================
 #  1️⃣ Upload por chunks
 # ==========================
@@ -111,14 +111,12 @@ async def extract_frames(
     print("----------------------------------------")
 
     start_time = time.time()
-    temp_chunk_path = os.path.join(UPLOAD_DIR, f"{uploadId}_part{chunkIndex}")
+    chunk_name = f"{uploadId}_part{chunkIndex}"
 
-    # Guardar chunk temporalmente
+    # Guardar chunk temporalmente (en S3 queda visible para todas las réplicas)
     try:
-        with open(temp_chunk_path, "wb") as f:
-            while content := await chunk.read(1024 * 1024):
-                f.write(content)
-        print(f"✅ Chunk {chunkIndex} guardado en {temp_chunk_path}")
+        await run_in_threadpool(storage.save_stream, UPLOADS, chunk_name, chunk.file)
+        print(f"✅ Chunk {chunkIndex} guardado en {UPLOADS}/{chunk_name}")
     except Exception as e:
         print(f"❌ Error guardando chunk {chunkIndex}: {e}")
         raise HTTPException(status_code=500, detail=f"Error guardando chunk {chunkIndex}: {e}")
@@ -131,27 +129,18 @@ async def extract_frames(
     print("🔧 Ensamblando video final...")
     safe_name = os.path.basename(originalName)
     final_filename = f"{uploadId}_{safe_name}"
-    final_video_path = os.path.join(VIDEOS_DIR, final_filename)
+    parts = [f"{uploadId}_part{i}" for i in range(totalChunks)]
 
     try:
-        with open(final_video_path, "wb") as final_file:
-            for i in range(totalChunks):
-                part_path = os.path.join(UPLOAD_DIR, f"{uploadId}_part{i}")
-                if not os.path.exists(part_path):
-                    print(f"❌ Falta chunk {i}")
-                    raise RuntimeError(f"Falta chunk {i}")
-                print(f"🧩 Añadiendo chunk {i} al video final...")
-                with open(part_path, "rb") as p:
-                    final_file.write(p.read())
-                os.remove(part_path)
-        print(f"✅ Video ensamblado correctamente: {final_video_path}")
+        await run_in_threadpool(storage.assemble, VIDEOS, final_filename, parts)
+        print(f"✅ Video ensamblado correctamente: {VIDEOS}/{final_filename}")
     except Exception as e:
         print(f"❌ Error ensamblando video: {e}")
         raise HTTPException(status_code=500, detail=f"Error ensamblando video: {e}")
 
-    # Extraer frames desde el archivo en /videos
+    # Extraer frames desde el video guardado (ruta local o URL firmada)
     print("🚀 Iniciando extracción de frames...")
-    frames = _extract_frames_ffmpeg(final_video_path, uploadId)
+    frames = await run_in_threadpool(_extract_frames_ffmpeg, final_filename, uploadId)
     print(f"✅ Extracción completada ({len(frames)} frames).")
 
     total_time = time.time() - start_time
@@ -181,24 +170,21 @@ async def extract_frames_from_url(video_url: str = Form(...)):
     start = time.time()
     upload_id = str(uuid.uuid4())
 
-    # Guardar en VIDEOS_DIR
+    # Guardar en el área de videos
     final_filename = f"{upload_id}.mp4"
-    final_video_path = os.path.join(VIDEOS_DIR, final_filename)
 
     print(f"⬇️ Descargando video desde: {video_url}")
     try:
         r = requests.get(video_url, stream=True, timeout=60)
         r.raise_for_status()
-        with open(final_video_path, "wb") as f:
-            for chunk in r.iter_content(chunk_size=1024 * 1024):
-                if chunk:
-                    f.write(chunk)
-        print(f"✅ Video guardado en: {final_video_path}")
+        r.raw.decode_content = True
+        await run_in_threadpool(storage.save_stream, VIDEOS, final_filename, r.raw)
+        print(f"✅ Video guardado en: {VIDEOS}/{final_filename}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"No se pudo descargar el video: {e}")
 
     # Extraer frames
-    frames = _extract_frames_ffmpeg(final_video_path, upload_id)
+    frames = await run_in_threadpool(_extract_frames_ffmpeg, final_filename, upload_id)
     print(f"✅ Extracción finalizada ({len(frames)} frames) en {time.time() - start:.1f}s")
 
     # Retornar con path
@@ -236,26 +222,24 @@ async def cleanup_files(request: Request):
     deleted_videos = 0
 
     # 🧩 1️⃣ Eliminar frames asociados
-    for file in os.listdir(FRAMES_DIR):
-        if file.startswith(upload_id):
-            file_path = os.path.join(FRAMES_DIR, file)
-            try:
-                os.remove(file_path)
-                print(f"🗑️ Eliminado frame: {file_path}")
-                deleted_frames += 1
-            except Exception as e:
-                print(f"⚠️ Error eliminando frame {file}: {e}")
+    for file in storage.list(FRAMES, prefix=upload_id):
+        try:
+            storage.delete(FRAMES, file)
+            print(f"🗑️ Eliminado frame: {FRAMES}/{file}")
+            deleted_frames += 1
+        except Exception as e:
+            print(f"⚠️ Error eliminando frame {file}: {e}")
 
     # 🧩 2️⃣ Eliminar videos asociados
-    for file in os.listdir(VIDEOS_DIR):
-        if file.startswith(upload_id):
-            file_path = os.path.join(VIDEOS_DIR, file)
-            try:
-                os.remove(file_path)
-                print(f"🎬🗑️ Eliminado video: {file_path}")
-                deleted_videos += 1
-            except Exception as e:
-                print(f"⚠️ Error eliminando video {file}: {e}")
+    for file in storage.list(VIDEOS, prefix=upload_id):
+        try:
+            storage.delete(VIDEOS, file)
+            forget_probe(file)
+            frame_cache.forget(file)
+            print(f"🎬🗑️ Eliminado video: {VIDEOS}/{file}")
+            deleted_videos += 1
+        except Exception as e:
+            print(f"⚠️ Error eliminando video {file}: {e}")
 
     print("✅ Cleanup completo:")
     print(f"   🖼️ Frames eliminados: {deleted_frames}")
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse, RedirectResponse
+from services.storage import storage, FRAMES, GENERATED_PNG
+
+# Reemplaza los StaticFiles de /frames y /generated_png:
+# en local sirve el archivo, en S3 redirige a una URL firmada.
+router = APIRouter(tags=["Files"])
+
+
+def _serve(area: str, filename: str):
+    try:
+        if not storage.exists(area, filename):
+            raise HTTPException(status_code=404, detail="Archivo no encontrado")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Nombre de archivo inválido")
+
+    path = storage.local_path(area, filename)
+    if path:
+        return FileResponse(path)
+    return RedirectResponse(storage.read_url(area, filename), status_code=307)
+
+
+@router.get("/frames/{filename}")
+def get_frame(filename: str):
+    return _serve(FRAMES, filename)
+
+
+@router.get("/generated_png/{filename}")
+def get_generated_png(filename: str):
+    return _serve(GENERATED_PNG, filename)
@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Request
 from pydantic import BaseModel
-import uuid, os
+import uuid, os, tempfile
+from starlette.concurrency import run_in_threadpool
 from playwright.async_api import async_playwright
+from services.storage import storage, GENERATED_PNG
 
 router = APIRouter(prefix="/html-to-png", tags=["html_to_png"])
 
@@ -10,11 +12,9 @@ class HTMLPayload(BaseModel):
 
 @router.post("/")
 async def convert_html_to_png(payload: HTMLPayload, request: Request):
-    output_dir = "generated_png"
-    os.makedirs(output_dir, exist_ok=True)
-
     filename = f"{uuid.uuid4()}.png"
-    output_path = os.path.join(output_dir, filename)
+    # En local se escribe directo en la carpeta final; en S3 se sube después
+    output_path = storage.local_path(GENERATED_PNG, filename) or os.path.join(tempfile.gettempdir(), filename)
 
     html = payload.html
 
@@ -39,6 +39,12 @@ async def convert_html_to_png(payload: HTMLPayload, request: Request):
 
         await browser.close()
 
+    if not storage.local_path(GENERATED_PNG, filename):
+        try:
+            await run_in_threadpool(storage.save_file, GENERATED_PNG, filename, output_path)
+        finally:
+            os.remove(output_path)
+
     base = str(request.base_url).rstrip("/")
     url = f"{base}/generated_png/{filename}"
 
@@ -1,12 +1,10 @@
-from fastapi import APIRouter, UploadFile, Form, File
+from fastapi import APIRouter, UploadFile, Form, File, HTTPException
+from starlette.concurrency import run_in_threadpool
 import os
+from services.storage import storage, StorageNotFound, UPLOADS
 
 router = APIRouter(prefix="/upload_videos", tags=["Uploads"])
 
-# Carpeta donde se guardarán los videos subidos
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
 
 @router.post("/")
 async def upload_video(
@@ -27,11 +25,7 @@ async def upload_video(
     """
 
     # Guardar cada chunk temporalmente
-    temp_chunk_path = os.path.join(UPLOAD_DIR, f"{uploadId}_part{chunkIndex}")
-
-    with open(temp_chunk_path, "wb") as f:
-        while content := await chunk.read(1024 * 1024):
-            f.write(content)
+    await run_in_threadpool(storage.save_stream, UPLOADS, f"{uploadId}_part{chunkIndex}", chunk.file)
 
     # Si aún no es el último fragmento, confirmar recepción
     if chunkIndex < totalChunks - 1:
@@ -43,20 +37,20 @@ async def upload_video(
         }
 
     # 🔚 Si es el último fragmento, unir todos los pedazos
-    final_filename = f"{uploadId}_{originalName}"
-    final_path = os.path.join(UPLOAD_DIR, final_filename)
+    final_filename = f"{uploadId}_{os.path.basename(originalName)}"
+    parts = [f"{uploadId}_part{i}" for i in range(totalChunks)]
 
-    with open(final_path, "wb") as final_file:
-        for i in range(totalChunks):
-            part_path = os.path.join(UPLOAD_DIR, f"{uploadId}_part{i}")
-            with open(part_path, "rb") as part_file:
-                final_file.write(part_file.read())
-            os.remove(part_path)
+    try:
+        await run_in_threadpool(storage.assemble, UPLOADS, final_filename, parts, UPLOADS)
+    except StorageNotFound as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     return {
         "status": "complete",
         "uploadId": uploadId,
-        "path": final_path,
+        "area": UPLOADS,
+        # Ruta en disco con backend local; en S3 la clave lógica área/nombre
+        "path": storage.local_path(UPLOADS, final_filename) or f"{UPLOADS}/{final_filename}",
         "filename": final_filename,
         "mimeType": mimeType,
         "title": title,
@@ -1,25 +1,25 @@
-from fastapi import APIRouter, Request, HTTPException
-from fastapi.responses import StreamingResponse
-import os, re
+from fastapi import APIRouter, Request, HTTPException, Query
+from fastapi.responses import StreamingResponse, Response
+import re, hashlib, math, subprocess
+from services.storage import storage, safe_name, StorageNotFound, VIDEOS
+from services.video_probe import get_probe, nearest_keyframe
+from services.frame_cache import frame_cache
 
 router = APIRouter(prefix="/videos", tags=["Video Streaming"])
 
-VIDEO_DIR = "videos"
-os.makedirs(VIDEO_DIR, exist_ok=True)
-
 
 @router.get("/{filename}")
-async def stream_video(filename: str, request: Request):
+def stream_video(filename: str, request: Request):
     """
     Sirve un video con soporte de Range (para saltar entre posiciones) y CORS abierto.
     Ejemplo de uso en el front:
     <video src="http://localhost:8000/videos/mi_video.mp4" controls crossorigin="anonymous"></video>
     """
-    file_path = os.path.join(VIDEO_DIR, filename)
-    if not os.path.exists(file_path):
+    try:
+        file_size = storage.size(VIDEOS, filename)
+    except (StorageNotFound, ValueError):
         raise HTTPException(status_code=404, detail="Video no encontrado")
 
-    file_size = os.path.getsize(file_path)
     range_header = request.headers.get("range")
     start, end = 0, file_size - 1
 
@@ -28,26 +28,18 @@ async def stream_video(filename: str, request: Request):
         if match:
             start = int(match.group(1))
             if match.group(2):
-                end = int(match.group(2))
-        if start >= file_size:
-            raise HTTPException(status_code=416, detail="Rango fuera de límites")
-
-    def iterfile(start_pos, end_pos):
-        with open(file_path, "rb") as f:
-            f.seek(start_pos)
-            remaining = end_pos - start_pos + 1
-            chunk_size = 1024 * 1024
-            while remaining > 0:
-                chunk = f.read(min(chunk_size, remaining))
-                if not chunk:
-                    break
-                yield chunk
-                remaining -= len(chunk)
+                end = min(int(match.group(2)), file_size - 1)
+        if start >= file_size or end < start:
+            raise HTTPException(
+                status_code=416, detail="Rango fuera de límites",
+                headers={"Content-Range": f"bytes */{file_size}"}
+            )
 
     headers = {
         "Content-Type": "video/mp4",
         "Accept-Ranges": "bytes",
         "Content-Range": f"bytes {start}-{end}/{file_size}",
+        "Content-Length": str(end - start + 1),
         "Access-Control-Allow-Origin": "*",
         "Access-Control-Allow-Headers": "*",
         "Access-Control-Allow-Methods": "GET, HEAD, OPTIONS",
@@ -56,4 +48,83 @@ async def stream_video(filename: str, request: Request):
     }
 
 
-    return StreamingResponse(iterfile(start, end), status_code=206, headers=headers)
+    # En S3 se lee solo el rango pedido (GetObject con Range), sin descargar el video
+    return StreamingResponse(storage.iter_range(VIDEOS, filename, start, end), status_code=206, headers=headers)
+
+
+@router.get("/{filename}/frame")
+def get_frame_at(
+    filename: str,
+    request: Request,
+    t: float = Query(..., ge=0, description="Segundo del video"),
+    w: int = Query(None, ge=16, le=4096, description="Ancho de salida (mantiene proporción)")
+):
+    """
+    Devuelve un único frame JPEG en el segundo `t`, sin pre-extraer todo el video.
+    Busca el keyframe anterior en el índice del probe y decodifica solo desde ahí.
+    Ejemplo: /videos/mi_video.mp4/frame?t=12.5&w=640
+    """
+    try:
+        safe_name(filename)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Video no encontrado")
+
+    try:
+        probe = get_probe(filename)
+    except StorageNotFound:
+        raise HTTPException(status_code=404, detail="Video no encontrado")
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if t > probe["duration"]:
+        raise HTTPException(status_code=400, detail=f"t fuera de la duración del video ({probe['duration']:.2f}s)")
+
+    # Más allá del último frame (ej. t == duración) ffmpeg no produce salida:
+    # se usa el último frame decodificable. Redondeo hacia abajo al milisegundo
+    # para no pasarse de su pts.
+    t = min(round(t, 3), math.floor(probe["last_frame"] * 1000) / 1000)
+    # La versión del video (mtime / ETag de S3) invalida cache y ETag si se reemplaza
+    key = (filename, probe["version"], t, w)
+    etag = '"' + hashlib.sha1(repr(key).encode()).hexdigest() + '"'
+    headers = {
+        "ETag": etag,
+        # La URL no incluye la versión del video: el cliente debe revalidar siempre
+        # con If-None-Match (304 barato) para enterarse si el video se reemplazó
+        "Cache-Control": "public, no-cache",
+        "Access-Control-Allow-Origin": "*",
+        "Access-Control-Expose-Headers": "ETag",
+    }
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match.strip() == "*" or etag in [v.strip().removeprefix("W/") for v in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    content = frame_cache.get(key)
+    if content is None:
+        keyframe = nearest_keyframe(probe, t)
+        # -ss antes de -i salta directo al keyframe; el segundo -ss decodifica solo el resto
+        cmd = [
+            "ffmpeg", "-v", "error",
+            "-ss", f"{keyframe:.6f}",
+            "-i", storage.ffmpeg_input(VIDEOS, filename),
+            "-ss", f"{max(t - keyframe, 0.0):.6f}",
+            "-frames:v", "1",
+        ]
+        if w:
+            cmd += ["-vf", f"scale={w}:-2"]
+        cmd += ["-q:v", "2", "-f", "image2pipe", "-c:v", "mjpeg", "pipe:1"]
+
+        result = subprocess.run(cmd, capture_output=True)
+        if result.returncode != 0:
+            detail = result.stderr.decode(errors="replace").strip()
+            print(f"⚠️ [FFMPEG] Error extrayendo frame de {filename} en t={t}s: {detail}")
+            raise HTTPException(status_code=500, detail=f"No se pudo extraer el frame: {detail}")
+        if not result.stdout:
+            # ffmpeg terminó bien pero no hay frame en ese instante: no es un error del servidor
+            print(f"⚠️ [FFMPEG] Sin frame en {filename} para t={t}s")
+            raise HTTPException(status_code=422, detail=f"No hay frame decodificable en t={t}s")
+
+        content = result.stdout
+        frame_cache.put(key, content)
+
+    return Response(content=content, media_type="image/jpeg", headers=headers)
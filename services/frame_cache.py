@@ -0,0 +1,46 @@
+import os, threading
+from collections import OrderedDict
+
+# ============================================================
+#  FRAME CACHE
+#  Cache LRU en memoria de frames ya codificados (JPEG), acotada por bytes.
+#    FRAME_CACHE_MAX_BYTES   tamaño máximo total (default: 64 MB)
+# ============================================================
+
+
+class LRUBytesCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._items[key] = value
+            self._bytes += len(value)
+            # Expulsar los menos usados recientemente
+            while self._bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def forget(self, filename: str) -> None:
+        """Elimina los frames de un video (claves con el filename como primer elemento)."""
+        with self._lock:
+            for key in [k for k in self._items if k[0] == filename]:
+                self._bytes -= len(self._items.pop(key))
+
+
+frame_cache = LRUBytesCache(int(os.getenv("FRAME_CACHE_MAX_BYTES", str(64 * 1024 * 1024))))
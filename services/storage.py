@@ -0,0 +1,390 @@
+import os, shutil, tempfile
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+# ============================================================
+#  STORAGE
+#  Abstracción de almacenamiento para uploads, frames, videos, PNGs y probes.
+#  - "local": carpetas en disco (comportamiento original, 1 réplica).
+#  - "s3": bucket S3 compatible (AWS, MinIO...), compartido entre réplicas.
+#
+#  Configuración por variables de entorno:
+#    STORAGE_BACKEND            local | s3            (default: local)
+#    STORAGE_LOCAL_ROOT         raíz de las carpetas  (default: ".")
+#    STORAGE_S3_BUCKET          bucket (obligatorio con s3)
+#    STORAGE_S3_PREFIX          prefijo opcional dentro del bucket
+#    STORAGE_S3_ENDPOINT_URL    endpoint (MinIO / moto server)
+#    STORAGE_S3_REGION          región
+#    STORAGE_PRESIGN_EXPIRES    segundos de validez de URLs firmadas (default: 3600)
+# ============================================================
+
+# Áreas lógicas (se corresponden con las carpetas originales)
+UPLOADS = "uploads"
+FRAMES = "frames"
+VIDEOS = "videos"
+GENERATED_PNG = "generated_png"
+PROBES = "probes"  # metadatos ffprobe cacheados por video
+
+AREAS = (UPLOADS, FRAMES, VIDEOS, GENERATED_PNG, PROBES)
+
+CHUNK_SIZE = 1024 * 1024
+# S3 exige partes de al menos 5 MB (salvo la última) en multipart upload
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class StorageNotFound(Exception):
+    """El objeto solicitado no existe en el almacenamiento."""
+
+
+def safe_name(name: str) -> str:
+    """Evita path traversal: solo se acepta el nombre base."""
+    base = os.path.basename(name)
+    if not base or base in (".", ".."):
+        raise ValueError(f"Nombre de archivo inválido: {name!r}")
+    return base
+
+
+class Storage(ABC):
+    """Interfaz común de los backends."""
+
+    @abstractmethod
+    def save_stream(self, area: str, name: str, fileobj) -> None:
+        ...
+
+    def save_file(self, area: str, name: str, path: str) -> None:
+        with open(path, "rb") as f:
+            self.save_stream(area, name, f)
+
+    @abstractmethod
+    def exists(self, area: str, name: str) -> bool:
+        ...
+
+    @abstractmethod
+    def size(self, area: str, name: str) -> int:
+        ...
+
+    @abstractmethod
+    def version(self, area: str, name: str) -> str:
+        """Identificador que cambia si el objeto se reemplaza (aunque tenga el mismo tamaño)."""
+
+    @abstractmethod
+    def iter_range(self, area: str, name: str, start: int, end: int):
+        """Itera los bytes [start, end] (inclusive) del objeto."""
+
+    def read_bytes(self, area: str, name: str) -> bytes:
+        """Lee el objeto completo (pensado para archivos pequeños, ej. JSON)."""
+        size = self.size(area, name)
+        if size == 0:
+            return b""
+        return b"".join(self.iter_range(area, name, 0, size - 1))
+
+    @abstractmethod
+    def delete(self, area: str, name: str) -> None:
+        ...
+
+    @abstractmethod
+    def list(self, area: str, prefix: str = "") -> list:
+        ...
+
+    @abstractmethod
+    def assemble(self, area: str, name: str, parts: list, parts_area: str = UPLOADS) -> None:
+        """Une los chunks `parts` (en orden) en `area/name` y borra los chunks."""
+
+    def local_path(self, area: str, name: str):
+        """Ruta en disco si el backend es local, si no None."""
+        return None
+
+    def read_url(self, area: str, name: str):
+        """URL firmada de lectura directa si el backend la soporta, si no None."""
+        return None
+
+    def ffmpeg_input(self, area: str, name: str) -> str:
+        """Entrada utilizable por ffmpeg/ffprobe: ruta local o URL firmada."""
+        path = self.local_path(area, name)
+        if path:
+            return path
+        url = self.read_url(area, name)
+        if not url:
+            raise StorageNotFound(f"{area}/{name}")
+        return url
+
+
+# ==========================
+#  Backend local
+# ==========================
+class LocalStorage(Storage):
+    def __init__(self, root: str = "."):
+        self.root = root
+        for area in AREAS:
+            os.makedirs(os.path.join(root, area), exist_ok=True)
+
+    def _path(self, area: str, name: str) -> str:
+        return os.path.join(self.root, area, safe_name(name))
+
+    @contextmanager
+    def _atomic_open(self, dest: str):
+        """
+        Escribe en un temporal (oculto) y lo mueve a `dest` al terminar:
+        un lector nunca ve un archivo a medias y un fallo no deja restos.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest), prefix=".tmp_")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                yield f
+            os.replace(tmp_path, dest)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def save_stream(self, area, name, fileobj):
+        with self._atomic_open(self._path(area, name)) as f:
+            shutil.copyfileobj(fileobj, f, CHUNK_SIZE)
+
+    def save_file(self, area, name, path):
+        dest = self._path(area, name)
+        if os.path.abspath(path) != os.path.abspath(dest):
+            with open(path, "rb") as src, self._atomic_open(dest) as f:
+                shutil.copyfileobj(src, f, CHUNK_SIZE)
+
+    def exists(self, area, name):
+        return os.path.exists(self._path(area, name))
+
+    def size(self, area, name):
+        path = self._path(area, name)
+        if not os.path.exists(path):
+            raise StorageNotFound(f"{area}/{name}")
+        return os.path.getsize(path)
+
+    def version(self, area, name):
+        try:
+            st = os.stat(self._path(area, name))
+        except FileNotFoundError:
+            raise StorageNotFound(f"{area}/{name}")
+        return f"{st.st_size}-{st.st_mtime_ns}"
+
+    def iter_range(self, area, name, start, end):
+        with open(self._path(area, name), "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                yield chunk
+                remaining -= len(chunk)
+
+    def delete(self, area, name):
+        path = self._path(area, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def list(self, area, prefix=""):
+        # Los temporales de escritura (".tmp_*") no son objetos del storage
+        return sorted(
+            f for f in os.listdir(os.path.join(self.root, area))
+            if f.startswith(prefix) and not f.startswith(".")
+        )
+
+    def assemble(self, area, name, parts, parts_area=UPLOADS):
+        part_paths = [self._path(parts_area, part) for part in parts]
+        for part, part_path in zip(parts, part_paths):
+            if not os.path.exists(part_path):
+                raise StorageNotFound(f"Falta chunk {part}")
+
+        # Se escribe en un temporal y se mueve al final: nunca queda un video a medias
+        with self._atomic_open(self._path(area, name)) as final_file:
+            for part_path in part_paths:
+                with open(part_path, "rb") as p:
+                    shutil.copyfileobj(p, final_file, CHUNK_SIZE)
+
+        for part_path in part_paths:
+            os.remove(part_path)
+
+    def local_path(self, area, name):
+        return self._path(area, name)
+
+
+# ==========================
+#  Backend S3 compatible
+# ==========================
+class S3Storage(Storage):
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: str = None,
+                 region: str = None, presign_expires: int = 3600):
+        try:
+            import boto3
+            from botocore.exceptions import ClientError
+        except ImportError as e:
+            raise RuntimeError("STORAGE_BACKEND=s3 requiere el paquete boto3") from e
+
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.presign_expires = presign_expires
+        self._client_error = ClientError
+        self.client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region)
+
+    def _key(self, area: str, name: str) -> str:
+        key = f"{area}/{safe_name(name)}"
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def _is_not_found(self, e) -> bool:
+        return e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+    def save_stream(self, area, name, fileobj):
+        self.client.upload_fileobj(fileobj, self.bucket, self._key(area, name))
+
+    def save_file(self, area, name, path):
+        self.client.upload_file(path, self.bucket, self._key(area, name))
+
+    def exists(self, area, name):
+        try:
+            self.size(area, name)
+            return True
+        except StorageNotFound:
+            return False
+
+    def _head(self, area, name):
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._key(area, name))
+        except self._client_error as e:
+            if self._is_not_found(e):
+                raise StorageNotFound(f"{area}/{name}")
+            raise
+
+    def size(self, area, name):
+        return self._head(area, name)["ContentLength"]
+
+    def version(self, area, name):
+        head = self._head(area, name)
+        return f"{head['ETag'].strip(chr(34))}-{head['LastModified'].timestamp():.0f}"
+
+    def iter_range(self, area, name, start, end):
+        obj = self.client.get_object(
+            Bucket=self.bucket, Key=self._key(area, name), Range=f"bytes={start}-{end}"
+        )
+        body = obj["Body"]
+        try:
+            for chunk in body.iter_chunks(CHUNK_SIZE):
+                yield chunk
+        finally:
+            body.close()
+
+    def delete(self, area, name):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(area, name))
+
+    def list(self, area, prefix=""):
+        area_prefix = f"{self.prefix}/{area}/" if self.prefix else f"{area}/"
+        names = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=area_prefix + prefix):
+            for obj in page.get("Contents", []):
+                names.append(obj["Key"][len(area_prefix):])
+        return sorted(names)
+
+    def assemble(self, area, name, parts, parts_area=UPLOADS):
+        """
+        Multipart upload: los chunks del cliente pueden llegar a réplicas
+        distintas, así que viven como objetos en `uploads/` y aquí se unen.
+        - Chunks >= 5 MB: copia en el servidor (upload_part_copy), sin pasar por el pod.
+        - Chunks pequeños: se acumulan en un buffer hasta completar 5 MB
+          (mínimo exigido por S3 salvo para la última parte).
+        """
+        sizes = []
+        for part in parts:
+            try:
+                sizes.append(self.size(parts_area, part))
+            except StorageNotFound:
+                raise StorageNotFound(f"Falta chunk {part}")
+
+        key = self._key(area, name)
+        mpu = self.client.create_multipart_upload(Bucket=self.bucket, Key=key)
+        upload_id = mpu["UploadId"]
+        completed = []
+        buffer = tempfile.SpooledTemporaryFile(max_size=S3_MIN_PART_SIZE * 2)
+
+        def flush():
+            buffer.seek(0)
+            resp = self.client.upload_part(
+                Bucket=self.bucket, Key=key, UploadId=upload_id,
+                PartNumber=len(completed) + 1, Body=buffer.read()
+            )
+            completed.append({"ETag": resp["ETag"], "PartNumber": len(completed) + 1})
+            buffer.seek(0)
+            buffer.truncate()
+
+        def copy(part, start, end):
+            resp = self.client.upload_part_copy(
+                Bucket=self.bucket, Key=key, UploadId=upload_id,
+                PartNumber=len(completed) + 1,
+                CopySource={"Bucket": self.bucket, "Key": self._key(parts_area, part)},
+                CopySourceRange=f"bytes={start}-{end}",
+            )
+            completed.append({"ETag": resp["CopyPartResult"]["ETag"], "PartNumber": len(completed) + 1})
+
+        def buffer_range(part, start, end):
+            for chunk in self.iter_range(parts_area, part, start, end):
+                buffer.write(chunk)
+
+        try:
+            for part, part_size in zip(parts, sizes):
+                offset = 0
+                # Completar primero el buffer pendiente con el inicio de este chunk
+                if buffer.tell() and part_size:
+                    take = min(S3_MIN_PART_SIZE - buffer.tell(), part_size)
+                    buffer_range(part, 0, take - 1)
+                    offset = take
+                    if buffer.tell() >= S3_MIN_PART_SIZE:
+                        flush()
+
+                remaining = part_size - offset
+                if remaining >= S3_MIN_PART_SIZE:
+                    copy(part, offset, part_size - 1)
+                elif remaining > 0:
+                    buffer_range(part, offset, part_size - 1)
+
+            if buffer.tell() > 0 or not completed:
+                flush()
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=key, UploadId=upload_id,
+                MultipartUpload={"Parts": completed}
+            )
+        except Exception:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+            raise
+        finally:
+            buffer.close()
+
+        for part in parts:
+            self.delete(parts_area, part)
+
+    def read_url(self, area, name):
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self._key(area, name)},
+            ExpiresIn=self.presign_expires,
+        )
+
+
+# ==========================
+#  Instancia global
+# ==========================
+def _build_storage() -> Storage:
+    backend = os.getenv("STORAGE_BACKEND", "local").lower()
+    if backend == "local":
+        return LocalStorage(os.getenv("STORAGE_LOCAL_ROOT", "."))
+    if backend == "s3":
+        bucket = os.getenv("STORAGE_S3_BUCKET")
+        if not bucket:
+            raise RuntimeError("STORAGE_S3_BUCKET es obligatorio con STORAGE_BACKEND=s3")
+        return S3Storage(
+            bucket=bucket,
+            prefix=os.getenv("STORAGE_S3_PREFIX", ""),
+            endpoint_url=os.getenv("STORAGE_S3_ENDPOINT_URL") or None,
+            region=os.getenv("STORAGE_S3_REGION") or None,
+            presign_expires=int(os.getenv("STORAGE_PRESIGN_EXPIRES", "3600")),
+        )
+    raise RuntimeError(f"STORAGE_BACKEND desconocido: {backend}")
+
+
+storage = _build_storage()
+print(f"🗄️ Storage backend: {type(storage).__name__}")
@@ -0,0 +1,224 @@
+import bisect, io, json, math, os, subprocess, threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from services.storage import storage, StorageNotFound, VIDEOS, PROBES
+
+# ============================================================
+#  PROBE CACHE
+#  Se analiza cada video una sola vez con ffprobe (JSON): duración, streams,
+#  codec e índice de keyframes. Se guarda en el storage (área "probes")
+#  para compartirlo entre réplicas y en memoria para no releerlo.
+#  Si la versión del video cambia (mtime local / ETag+LastModified en S3),
+#  el probe se considera obsoleto.
+#  Es bloqueante: desde handlers async llamarlo con run_in_threadpool.
+#    PROBE_CACHE_MAX_ENTRIES   probes en memoria (LRU, default: 256)
+# ============================================================
+
+PROBE_CACHE_MAX_ENTRIES = int(os.getenv("PROBE_CACHE_MAX_ENTRIES", "256"))
+
+_memory = OrderedDict()  # LRU acotada; el resto se relee del storage
+_lock = threading.Lock()
+# Un lock por video mientras alguien lo está analizando: [lock, usuarios]
+_file_locks = {}
+
+
+def _probe_name(filename: str) -> str:
+    return f"{filename}.json"
+
+
+# Claves mínimas para usar un probe persistido; si falta alguna se vuelve a analizar
+_REQUIRED_KEYS = ("version", "duration", "start_time", "last_frame", "keyframes")
+
+
+def _load_persisted(filename: str):
+    """Probe guardado en el storage, o None si no existe o está corrupto/incompleto."""
+    try:
+        probe = json.loads(storage.read_bytes(PROBES, _probe_name(filename)))
+    except StorageNotFound:
+        return None
+    except ValueError as e:
+        print(f"⚠️ [ffprobe] Probe guardado de {filename} ilegible, se vuelve a analizar: {e}")
+        return None
+    if not isinstance(probe, dict) or any(k not in probe for k in _REQUIRED_KEYS):
+        print(f"⚠️ [ffprobe] Probe guardado de {filename} incompleto, se vuelve a analizar")
+        return None
+    return probe
+
+
+def _memory_get(filename: str):
+    with _lock:
+        probe = _memory.get(filename)
+        if probe is not None:
+            _memory.move_to_end(filename)
+        return probe
+
+
+def _memory_put(filename: str, probe: dict) -> None:
+    with _lock:
+        _memory[filename] = probe
+        _memory.move_to_end(filename)
+        while len(_memory) > PROBE_CACHE_MAX_ENTRIES:
+            _memory.popitem(last=False)
+
+
+@contextmanager
+def _file_lock(filename: str):
+    """Solo un ffprobe a la vez por archivo; el lock se libera al terminar el último."""
+    with _lock:
+        entry = _file_locks.setdefault(filename, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _lock:
+            entry[1] -= 1
+            if entry[1] == 0:
+                _file_locks.pop(filename, None)
+
+
+def _ffprobe_json(args: list) -> dict:
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-of", "json"] + args,
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout)
+
+
+def _run_ffprobe(video_input: str) -> dict:
+    """
+    Formato y streams (solo cabecera) + paquetes del primer stream de video
+    (para los keyframes). Los paquetes de audio no se listan.
+    """
+    raw = _ffprobe_json([
+        "-show_entries",
+        "format=duration,start_time,format_name,bit_rate"
+        ":stream=index,codec_type,codec_name,width,height,avg_frame_rate,duration",
+        video_input
+    ])
+    packets = _ffprobe_json([
+        "-select_streams", "v:0",
+        "-show_entries", "packet=stream_index,pts_time,flags",
+        video_input
+    ])
+    raw["packets"] = packets.get("packets", [])
+    return raw
+
+
+def _float(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+
+def _frame_rate(value):
+    """Convierte "30000/1001" en 29.97 (None si no es válido)."""
+    try:
+        num, _, den = str(value).partition("/")
+        rate = float(num) / float(den or 1)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    return rate if math.isfinite(rate) and rate > 0 else None
+
+
+def _build_probe(filename: str, version: str, raw: dict) -> dict:
+    fmt = raw.get("format", {})
+    streams = raw.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+
+    duration = _float(fmt.get("duration"))
+    if duration is None:
+        durations = [d for d in (_float(s.get("duration")) for s in streams) if d]
+        duration = max(durations) if durations else None
+    if duration is None or duration <= 0:
+        raise ValueError("Duración inválida")
+
+    # pts_time es absoluto; t y el -ss de entrada de ffmpeg se miden desde el
+    # inicio del archivo (start_time), así que el índice se guarda relativo a él
+    start_time = _float(fmt.get("start_time")) or 0.0
+    keyframes = []
+    frame_times = []
+    if video is not None:
+        for p in raw.get("packets", []):
+            t = _float(p.get("pts_time"))
+            if t is None or p.get("stream_index") != video.get("index"):
+                continue
+            t = max(t - start_time, 0.0)
+            frame_times.append(t)
+            if "K" in p.get("flags", ""):
+                keyframes.append(t)
+        keyframes = sorted(set(keyframes))
+
+    # Último instante con un frame decodificable: el último paquete de video o,
+    # si no hay paquetes, duración menos un frame (según avg_frame_rate)
+    if frame_times:
+        last_frame = max(frame_times)
+    else:
+        fps = _frame_rate(video.get("avg_frame_rate")) if video else None
+        last_frame = max(duration - 1 / fps, 0.0) if fps else duration
+
+    return {
+        "filename": filename,
+        "version": version,
+        "duration": duration,
+        "start_time": start_time,
+        "last_frame": last_frame,
+        "format_name": fmt.get("format_name"),
+        "bit_rate": fmt.get("bit_rate"),
+        "video_codec": video.get("codec_name") if video else None,
+        "width": video.get("width") if video else None,
+        "height": video.get("height") if video else None,
+        "streams": streams,
+        "keyframes": keyframes,
+    }
+
+
+def get_probe(filename: str) -> dict:
+    """
+    Devuelve el probe del video `filename` del área de videos.
+    Orden: memoria -> storage -> ffprobe. Lanza StorageNotFound si el video no existe
+    y RuntimeError si ffprobe falla.
+    """
+    version = storage.version(VIDEOS, filename)
+
+    probe = _memory_get(filename)
+    if probe and probe.get("version") == version:
+        return probe
+
+    with _file_lock(filename):
+        # Otra petición pudo haber terminado el probe mientras esperábamos
+        probe = _memory_get(filename)
+        if probe and probe.get("version") == version:
+            return probe
+
+        probe = _load_persisted(filename)
+
+        if not probe or probe.get("version") != version:
+            print(f"📏 [ffprobe] Analizando {filename}...")
+            try:
+                raw = _run_ffprobe(storage.ffmpeg_input(VIDEOS, filename))
+                probe = _build_probe(filename, version, raw)
+            except Exception as e:
+                print(f"❌ [ffprobe] Error analizando {filename}: {e}")
+                raise RuntimeError(f"No se pudo analizar el video: {e}")
+            storage.save_stream(PROBES, _probe_name(filename), io.BytesIO(json.dumps(probe).encode()))
+            print(f"✅ [ffprobe] {filename}: {probe['duration']:.2f}s, {len(probe['keyframes'])} keyframes.")
+
+        _memory_put(filename, probe)
+        return probe
+
+
+def forget_probe(filename: str) -> None:
+    """Elimina el probe de memoria y del storage (ej. al borrar el video)."""
+    with _lock:
+        _memory.pop(filename, None)
+    storage.delete(PROBES, _probe_name(filename))
+
+
+def nearest_keyframe(probe: dict, t: float) -> float:
+    """Último keyframe en o antes de `t` (0 si no hay índice)."""
+    keyframes = probe.get("keyframes") or []
+    i = bisect.bisect_right(keyframes, t)
+    return keyframes[i - 1] if i else 0.0
@@ -0,0 +1,38 @@
+import os, sys, tempfile
+
+# services.storage crea la instancia global al importarse: apuntarla a un
+# directorio temporal para no escribir en el repo durante los tests.
+os.environ.setdefault("STORAGE_BACKEND", "local")
+os.environ.setdefault("STORAGE_LOCAL_ROOT", tempfile.mkdtemp(prefix="leaf_storage_"))
+
+# Credenciales falsas para moto (nunca se habla con AWS real)
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import boto3
+import pytest
+from moto import mock_aws
+from services.storage import LocalStorage, S3Storage
+
+BUCKET = "leaf-test"
+
+
+@pytest.fixture
+def local(tmp_path):
+    return LocalStorage(str(tmp_path))
+
+
+@pytest.fixture
+def s3():
+    with mock_aws():
+        boto3.client("s3").create_bucket(Bucket=BUCKET)
+        yield S3Storage(BUCKET, prefix="leaf")
+
+
+@pytest.fixture(params=["local", "s3"])
+def backend(request):
+    """Cada test con este fixture corre contra ambos backends."""
+    return request.getfixturevalue(request.param)
@@ -0,0 +1,41 @@
+from services.frame_cache import LRUBytesCache
+
+
+def test_evicts_least_recently_used_by_bytes():
+    cache = LRUBytesCache(10)
+    cache.put(("a", "v1", 1.0, None), b"12345")
+    cache.put(("b", "v1", 1.0, None), b"12345")
+    assert cache.get(("a", "v1", 1.0, None)) == b"12345"  # "a" pasa a ser el más reciente
+
+    cache.put(("c", "v1", 1.0, None), b"1")
+    assert cache.get(("b", "v1", 1.0, None)) is None
+    assert cache.get(("a", "v1", 1.0, None)) == b"12345"
+    assert cache.get(("c", "v1", 1.0, None)) == b"1"
+    assert cache._bytes == 6
+
+
+def test_replacing_a_key_updates_the_byte_count():
+    cache = LRUBytesCache(10)
+    cache.put(("a", "v1", 1.0, None), b"12345")
+    cache.put(("a", "v1", 1.0, None), b"12")
+    assert cache._bytes == 2
+
+
+def test_oversize_values_are_not_cached():
+    cache = LRUBytesCache(4)
+    cache.put(("a", "v1", 1.0, None), b"123")
+    cache.put(("big", "v1", 1.0, None), b"12345")
+    assert cache.get(("big", "v1", 1.0, None)) is None
+    assert cache.get(("a", "v1", 1.0, None)) == b"123"
+
+
+def test_forget_drops_all_frames_of_a_video():
+    cache = LRUBytesCache(100)
+    cache.put(("a", "v1", 1.0, None), b"1")
+    cache.put(("a", "v1", 2.0, 320), b"22")
+    cache.put(("b", "v1", 1.0, None), b"333")
+    cache.forget("a")
+    assert cache.get(("a", "v1", 1.0, None)) is None
+    assert cache.get(("a", "v1", 2.0, 320)) is None
+    assert cache.get(("b", "v1", 1.0, None)) == b"333"
+    assert cache._bytes == 3
@@ -0,0 +1,202 @@
+import io, os
+import pytest
+from services.storage import LocalStorage, StorageNotFound, S3_MIN_PART_SIZE
+from conftest import BUCKET
+
+
+def _save_parts(st, upload_id, chunks):
+    names = []
+    for i, data in enumerate(chunks):
+        name = f"{upload_id}_part{i}"
+        st.save_stream("uploads", name, io.BytesIO(data))
+        names.append(name)
+    return names
+
+
+# ==========================
+#  Comunes a ambos backends
+# ==========================
+def test_iter_range_is_inclusive(backend):
+    backend.save_stream("videos", "v.mp4", io.BytesIO(b"0123456789"))
+    assert backend.size("videos", "v.mp4") == 10
+    assert b"".join(backend.iter_range("videos", "v.mp4", 2, 5)) == b"2345"
+    assert backend.read_bytes("videos", "v.mp4") == b"0123456789"
+
+
+def test_list_strips_area_and_filters_prefix(backend):
+    for name in ("a_1.jpg", "a_2.jpg", "b_1.jpg"):
+        backend.save_stream("frames", name, io.BytesIO(b"x"))
+    backend.save_stream("videos", "a_video.mp4", io.BytesIO(b"x"))
+
+    assert backend.list("frames", prefix="a_") == ["a_1.jpg", "a_2.jpg"]
+    assert backend.list("frames") == ["a_1.jpg", "a_2.jpg", "b_1.jpg"]
+
+
+def test_missing_object(backend):
+    assert not backend.exists("videos", "nope.mp4")
+    with pytest.raises(StorageNotFound):
+        backend.size("videos", "nope.mp4")
+
+
+def test_version_changes_when_replaced_with_same_size(backend):
+    backend.save_stream("videos", "v.mp4", io.BytesIO(b"aaaa"))
+    before = backend.version("videos", "v.mp4")
+    backend.save_stream("videos", "v.mp4", io.BytesIO(b"bbbb"))
+    if isinstance(backend, LocalStorage):
+        # Evitar depender de la resolución del mtime del filesystem
+        path = backend.local_path("videos", "v.mp4")
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+    assert backend.version("videos", "v.mp4") != before
+    with pytest.raises(StorageNotFound):
+        backend.version("videos", "nope.mp4")
+
+
+def test_delete(backend):
+    backend.save_stream("frames", "f.jpg", io.BytesIO(b"x"))
+    backend.delete("frames", "f.jpg")
+    assert not backend.exists("frames", "f.jpg")
+
+
+def test_assemble_small_chunks(backend):
+    chunks = [b"hello ", b"", b"world"]
+    parts = _save_parts(backend, "u", chunks)
+    backend.assemble("videos", "u_v.mp4", parts)
+
+    assert backend.read_bytes("videos", "u_v.mp4") == b"hello world"
+    assert backend.list("uploads") == []
+
+
+def test_assemble_missing_chunk_leaves_nothing(backend):
+    parts = _save_parts(backend, "u", [b"abc"])
+    with pytest.raises(StorageNotFound):
+        backend.assemble("videos", "u_v.mp4", parts + ["u_part1"])
+
+    assert not backend.exists("videos", "u_v.mp4")
+    assert backend.list("uploads") == ["u_part0"]
+
+
+# ==========================
+#  LocalStorage
+# ==========================
+def test_local_rejects_path_traversal(local, tmp_path):
+    local.save_stream("videos", "../escape.mp4", io.BytesIO(b"x"))
+    assert not os.path.exists(tmp_path / "escape.mp4")
+    assert local.exists("videos", "escape.mp4")
+    with pytest.raises(ValueError):
+        local.exists("videos", "..")
+
+
+def test_local_path_and_ffmpeg_input(local, tmp_path):
+    local.save_stream("videos", "v.mp4", io.BytesIO(b"x"))
+    expected = str(tmp_path / "videos" / "v.mp4")
+    assert local.local_path("videos", "v.mp4") == expected
+    assert local.ffmpeg_input("videos", "v.mp4") == expected
+    assert local.read_url("videos", "v.mp4") is None
+
+
+# ==========================
+#  S3Storage
+# ==========================
+def _part_sizes(s3, key):
+    """Tamaño de cada parte del objeto multipart, según S3."""
+    sizes = []
+    part_number = 1
+    while True:
+        head = s3.client.head_object(Bucket=BUCKET, Key=key, PartNumber=part_number)
+        sizes.append(head["ContentLength"])
+        if part_number >= head.get("PartsCount", 1):
+            return sizes
+        part_number += 1
+
+
+def test_s3_keys_use_prefix(s3):
+    s3.save_stream("frames", "f.jpg", io.BytesIO(b"x"))
+    keys = [o["Key"] for o in s3.client.list_objects_v2(Bucket=BUCKET)["Contents"]]
+    assert keys == ["leaf/frames/f.jpg"]
+
+
+def test_s3_assemble_buffers_small_chunks_into_min_size_parts(s3):
+    chunk = os.urandom(2 * 1024 * 1024)
+    chunks = [chunk] * 6  # 12 MB en chunks de 2 MB
+    parts = _save_parts(s3, "u", chunks)
+    s3.assemble("videos", "u_v.mp4", parts)
+
+    assert s3.read_bytes("videos", "u_v.mp4") == b"".join(chunks)
+    # 2+2+2 -> 5 MB (completa con 1 MB del tercero), 5 MB, resto
+    assert _part_sizes(s3, "leaf/videos/u_v.mp4") == [S3_MIN_PART_SIZE, S3_MIN_PART_SIZE, 2 * 1024 * 1024]
+    assert s3.list("uploads") == []
+
+
+def test_s3_assemble_copies_large_chunks_server_side(s3, monkeypatch):
+    small = os.urandom(1024 * 1024)
+    large = os.urandom(S3_MIN_PART_SIZE + 4 * 1024 * 1024)
+    tail = os.urandom(10)
+    chunks = [large, small, large, tail]
+    parts = _save_parts(s3, "u", chunks)
+
+    copies = []
+    real_copy = s3.client.upload_part_copy
+
+    def spy_copy(**kwargs):
+        copies.append((kwargs["PartNumber"], kwargs["CopySource"]["Key"], kwargs["CopySourceRange"]))
+        return real_copy(**kwargs)
+
+    monkeypatch.setattr(s3.client, "upload_part_copy", spy_copy)
+    s3.assemble("videos", "u_v.mp4", parts)
+
+    assert s3.read_bytes("videos", "u_v.mp4") == b"".join(chunks)
+    # 1) large copiado entero; 2) small + 4 MB del segundo large en buffer;
+    # 3) resto del segundo large copiado; 4) cola pequeña como última parte
+    top_up = S3_MIN_PART_SIZE - len(small)
+    assert copies == [
+        (1, "leaf/uploads/u_part0", f"bytes=0-{len(large) - 1}"),
+        (3, "leaf/uploads/u_part2", f"bytes={top_up}-{len(large) - 1}"),
+    ]
+    assert _part_sizes(s3, "leaf/videos/u_v.mp4") == [
+        len(large), S3_MIN_PART_SIZE, len(large) - top_up, len(tail)
+    ]
+    assert s3.list("uploads") == []
+
+
+def test_s3_assemble_aborts_multipart_on_error(s3, monkeypatch):
+    parts = _save_parts(s3, "u", [b"abc", b"def"])
+
+    def fail(**kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(s3.client, "complete_multipart_upload", fail)
+    with pytest.raises(RuntimeError):
+        s3.assemble("videos", "u_v.mp4", parts)
+
+    assert s3.client.list_multipart_uploads(Bucket=BUCKET).get("Uploads", []) == []
+    assert not s3.exists("videos", "u_v.mp4")
+    # Los chunks se conservan para poder reintentar
+    assert s3.list("uploads") == ["u_part0", "u_part1"]
+
+
+def test_s3_read_url_is_presigned(s3):
+    s3.save_stream("frames", "f.jpg", io.BytesIO(b"x"))
+    url = s3.read_url("frames", "f.jpg")
+    assert "leaf/frames/f.jpg" in url
+    assert "Signature" in url or "X-Amz-Signature" in url
+    assert s3.local_path("frames", "f.jpg") is None
+    assert s3.ffmpeg_input("frames", "f.jpg") == url
+
+
+def test_local_save_is_atomic(local, tmp_path):
+    local.save_stream("probes", "a.json", io.BytesIO(b'{"ok": true}'))
+
+    class Broken(io.BytesIO):
+        def read(self, *args):
+            data = super().read(*args)
+            if not data:
+                raise OSError("conexión cortada")
+            return data
+
+    with pytest.raises(OSError):
+        local.save_stream("probes", "a.json", Broken(b'{"version": '))
+
+    assert local.read_bytes("probes", "a.json") == b'{"ok": true}'
+    assert os.listdir(tmp_path / "probes") == ["a.json"]
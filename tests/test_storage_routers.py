@@ -0,0 +1,160 @@
+import io
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from routers import extract_frames, files_router, upload_videos, videos_router
+from services.storage import LocalStorage, FRAMES, GENERATED_PNG, UPLOADS, VIDEOS
+
+VIDEO_BYTES = b"0123456789"
+
+
+@pytest.fixture
+def st(backend, monkeypatch):
+    """Backend (local y S3) inyectado en los routers que usan el storage."""
+    for module in (extract_frames, files_router, upload_videos, videos_router):
+        monkeypatch.setattr(module, "storage", backend)
+    return backend
+
+
+@pytest.fixture
+def client(st):
+    app = FastAPI()
+    for module in (extract_frames, files_router, upload_videos, videos_router):
+        app.include_router(module.router)
+    return TestClient(app)
+
+
+def _chunk_form(upload_id, index, total, name="clip.mp4"):
+    return {
+        "uploadId": upload_id, "chunkIndex": str(index), "totalChunks": str(total),
+        "originalName": name, "mimeType": "video/mp4", "chunkSize": "4", "totalSize": "10",
+    }
+
+
+def _post_chunk(client, url, upload_id, index, total, data):
+    return client.post(url, data=_chunk_form(upload_id, index, total),
+                       files={"chunk": ("blob", io.BytesIO(data), "application/octet-stream")})
+
+
+# ==========================
+#  stream_video (Range)
+# ==========================
+@pytest.mark.parametrize("range_header, status, body, content_range", [
+    (None, 206, VIDEO_BYTES, "bytes 0-9/10"),
+    ("bytes=2-5", 206, b"2345", "bytes 2-5/10"),
+    ("bytes=7-", 206, b"789", "bytes 7-9/10"),
+    ("bytes=8-100", 206, b"89", "bytes 8-9/10"),
+    ("bytes=5-2", 416, None, "bytes */10"),
+    ("bytes=10-", 416, None, "bytes */10"),
+])
+def test_stream_video_ranges(client, st, range_header, status, body, content_range):
+    st.save_stream(VIDEOS, "v.mp4", io.BytesIO(VIDEO_BYTES))
+    headers = {"Range": range_header} if range_header else {}
+    r = client.get("/videos/v.mp4", headers=headers)
+
+    assert r.status_code == status
+    assert r.headers["content-range"] == content_range
+    if body is not None:
+        assert r.content == body
+        assert r.headers["content-length"] == str(len(body))
+        assert r.headers["accept-ranges"] == "bytes"
+
+
+def test_stream_video_missing(client):
+    assert client.get("/videos/nope.mp4").status_code == 404
+
+
+# ==========================
+#  /frames y /generated_png
+# ==========================
+@pytest.mark.parametrize("area, url", [(FRAMES, "/frames/f.jpg"), (GENERATED_PNG, "/generated_png/f.jpg")])
+def test_files_local_served_directly_s3_redirected(client, st, area, url):
+    st.save_stream(area, "f.jpg", io.BytesIO(b"jpeg"))
+    r = client.get(url, follow_redirects=False)
+
+    if isinstance(st, LocalStorage):
+        assert r.status_code == 200
+        assert r.content == b"jpeg"
+    else:
+        assert r.status_code == 307
+        assert f"leaf/{area}/f.jpg" in r.headers["location"]
+        assert "Signature" in r.headers["location"]
+
+
+def test_files_missing(client):
+    assert client.get("/frames/nope.jpg").status_code == 404
+
+
+def test_files_rejects_traversal_name(client):
+    # "%2E%2E" llega al handler como ".." (un ".." literal lo normaliza el cliente)
+    r = client.get("/frames/%2E%2E")
+    assert r.status_code == 400
+    assert r.json()["detail"] == "Nombre de archivo inválido"
+
+
+# ==========================
+#  Chunks -> assemble
+# ==========================
+def test_upload_videos_assembles_chunks(client, st):
+    assert _post_chunk(client, "/upload_videos/", "u1", 0, 3, b"0123").json()["status"] == "chunk_received"
+    assert _post_chunk(client, "/upload_videos/", "u1", 1, 3, b"4567").json()["status"] == "chunk_received"
+    r = _post_chunk(client, "/upload_videos/", "u1", 2, 3, b"89")
+
+    assert r.status_code == 200
+    body = r.json()
+    assert body["status"] == "complete"
+    assert body["filename"] == "u1_clip.mp4"
+    assert body["area"] == UPLOADS
+    expected_path = st.local_path(UPLOADS, "u1_clip.mp4") or f"{UPLOADS}/u1_clip.mp4"
+    assert body["path"] == expected_path
+    assert st.read_bytes(UPLOADS, "u1_clip.mp4") == VIDEO_BYTES
+    assert st.list(UPLOADS, prefix="u1_part") == []
+
+
+def test_upload_videos_missing_chunk_is_400(client, st):
+    _post_chunk(client, "/upload_videos/", "u2", 0, 3, b"0123")
+    r = _post_chunk(client, "/upload_videos/", "u2", 2, 3, b"89")
+
+    assert r.status_code == 400
+    assert "u2_part1" in r.json()["detail"]
+    assert not st.exists(UPLOADS, "u2_clip.mp4")
+
+
+def test_extract_frames_assembles_into_videos(client, st, monkeypatch):
+    extracted = []
+
+    def fake_extract(filename, upload_id):
+        extracted.append((filename, upload_id))
+        return [{"frame": f"{upload_id}_frame_0001.jpg", "time_sec": 5.0, "path": "/frames/x.jpg"}]
+
+    monkeypatch.setattr(extract_frames, "_extract_frames_ffmpeg", fake_extract)
+    _post_chunk(client, "/extract_frames/", "e1", 0, 2, b"01234")
+    r = _post_chunk(client, "/extract_frames/", "e1", 1, 2, b"56789")
+
+    assert r.status_code == 200
+    assert r.json()["video"] == {"filename": "e1_clip.mp4", "path": "/videos/e1_clip.mp4"}
+    assert extracted == [("e1_clip.mp4", "e1")]
+    assert st.read_bytes(VIDEOS, "e1_clip.mp4") == VIDEO_BYTES
+    assert st.list(UPLOADS, prefix="e1_") == []
+    # El video ensamblado se puede reproducir por el endpoint de streaming
+    assert client.get("/videos/e1_clip.mp4", headers={"Range": "bytes=0-3"}).content == b"0123"
+
+
+def test_extract_frames_missing_chunk(client, st, monkeypatch):
+    monkeypatch.setattr(extract_frames, "_extract_frames_ffmpeg", lambda *a: pytest.fail("no debe extraer"))
+    r = _post_chunk(client, "/extract_frames/", "e2", 1, 2, b"56789")
+
+    assert r.status_code == 500
+    assert "e2_part0" in r.json()["detail"]
+    assert not st.exists(VIDEOS, "e2_clip.mp4")
+
+
+def test_cleanup_deletes_frames_and_videos(client, st):
+    st.save_stream(FRAMES, "c1_frame_0001.jpg", io.BytesIO(b"x"))
+    st.save_stream(FRAMES, "other_frame_0001.jpg", io.BytesIO(b"x"))
+    st.save_stream(VIDEOS, "c1_clip.mp4", io.BytesIO(b"x"))
+
+    r = client.post("/extract_frames/cleanup", json={"uploadId": "c1"})
+    assert r.json()["deleted"] == {"frames": 1, "videos": 1}
+    assert st.list(FRAMES) == ["other_frame_0001.jpg"]
+    assert st.list(VIDEOS) == []
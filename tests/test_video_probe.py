@@ -0,0 +1,164 @@
+import io, threading, time
+import pytest
+from services import video_probe
+from services.storage import storage, VIDEOS
+from services.video_probe import _build_probe, get_probe, forget_probe, nearest_keyframe
+
+VIDEO = {"index": 0, "codec_type": "video", "codec_name": "h264", "width": 1280, "height": 720,
+         "avg_frame_rate": "25/1"}
+AUDIO = {"index": 1, "codec_type": "audio", "codec_name": "aac", "duration": "9.0"}
+
+
+def _raw(fmt=None, streams=(VIDEO, AUDIO), packets=()):
+    return {"format": fmt if fmt is not None else {"duration": "10.0"},
+            "streams": list(streams), "packets": list(packets)}
+
+
+# ==========================
+#  _build_probe
+# ==========================
+def test_build_probe_reads_format_and_video_stream():
+    probe = _build_probe("v.mp4", "1-1", _raw())
+    assert probe["duration"] == 10.0
+    assert probe["version"] == "1-1"
+    assert probe["video_codec"] == "h264"
+    assert (probe["width"], probe["height"]) == (1280, 720)
+    assert len(probe["streams"]) == 2
+
+
+def test_build_probe_duration_falls_back_to_longest_stream():
+    streams = [dict(VIDEO, duration="12.5"), AUDIO]
+    probe = _build_probe("v.mp4", "1", _raw(fmt={"duration": "N/A"}, streams=streams))
+    assert probe["duration"] == 12.5
+
+
+def test_build_probe_rejects_missing_duration():
+    with pytest.raises(ValueError):
+        _build_probe("v.mp4", "1", _raw(fmt={}, streams=[VIDEO]))
+
+
+def test_build_probe_keyframes_only_from_video_with_k_flag():
+    packets = [
+        {"stream_index": 0, "pts_time": "0.000000", "flags": "K__"},
+        {"stream_index": 1, "pts_time": "0.500000", "flags": "K_"},   # audio
+        {"stream_index": 0, "pts_time": "1.000000", "flags": "___"},  # no keyframe
+        {"stream_index": 0, "pts_time": "N/A", "flags": "K__"},
+        {"stream_index": 0, "pts_time": "4.000000", "flags": "K__"},
+        {"stream_index": 0, "pts_time": "9.960000", "flags": "___"},
+    ]
+    probe = _build_probe("v.mp4", "1", _raw(packets=packets))
+    assert probe["keyframes"] == [0.0, 4.0]
+    assert probe["last_frame"] == 9.96
+
+
+def test_build_probe_keyframes_relative_to_start_time():
+    packets = [
+        {"stream_index": 0, "pts_time": "1.400000", "flags": "K__"},
+        {"stream_index": 0, "pts_time": "3.400000", "flags": "K__"},
+        {"stream_index": 0, "pts_time": "5.360000", "flags": "___"},
+    ]
+    probe = _build_probe("v.ts", "1", _raw(fmt={"duration": "4.0", "start_time": "1.400000"}, packets=packets))
+    assert probe["start_time"] == 1.4
+    assert probe["keyframes"] == pytest.approx([0.0, 2.0])
+    assert probe["last_frame"] == pytest.approx(3.96)
+
+
+def test_build_probe_last_frame_falls_back_to_frame_rate():
+    probe = _build_probe("v.mp4", "1", _raw())
+    assert probe["last_frame"] == pytest.approx(10.0 - 1 / 25)
+
+
+# ==========================
+#  nearest_keyframe
+# ==========================
+@pytest.mark.parametrize("t, expected", [
+    (0.0, 0.0), (3.99, 2.0), (4.0, 4.0), (4.01, 4.0), (100.0, 8.0),
+])
+def test_nearest_keyframe(t, expected):
+    assert nearest_keyframe({"keyframes": [0.0, 2.0, 4.0, 8.0]}, t) == expected
+
+
+def test_nearest_keyframe_without_index():
+    assert nearest_keyframe({"keyframes": []}, 5.0) == 0.0
+    assert nearest_keyframe({"keyframes": [1.0]}, 0.5) == 0.0
+
+
+# ==========================
+#  get_probe (cache)
+# ==========================
+@pytest.fixture
+def video():
+    filename = "probe_test.mp4"
+    storage.save_stream(VIDEOS, filename, io.BytesIO(b"fake video"))
+    yield filename
+    forget_probe(filename)
+    storage.delete(VIDEOS, filename)
+
+
+def test_get_probe_runs_ffprobe_once_for_concurrent_requests(video, monkeypatch):
+    calls = []
+
+    def fake_ffprobe(video_input):
+        calls.append(video_input)
+        time.sleep(0.05)
+        return _raw()
+
+    monkeypatch.setattr(video_probe, "_run_ffprobe", fake_ffprobe)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(get_probe(video))) for _ in range(5)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+
+    assert len(calls) == 1
+    assert all(r["duration"] == 10.0 for r in results)
+    assert video not in video_probe._file_locks
+
+
+def test_get_probe_is_persisted_and_reprobed_when_version_changes(video, monkeypatch):
+    calls = []
+    monkeypatch.setattr(video_probe, "_run_ffprobe", lambda i: calls.append(i) or _raw())
+    first = get_probe(video)
+
+    # Otra réplica: memoria vacía, el probe se lee del storage
+    video_probe._memory.clear()
+    assert get_probe(video) == first
+    assert len(calls) == 1
+
+    # Mismo tamaño, contenido nuevo: la versión cambia y se vuelve a analizar
+    monkeypatch.setattr(video_probe.storage, "version", lambda area, name: "otra-version")
+    assert get_probe(video)["version"] == "otra-version"
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize("persisted", [b'{"version": ', b'{"version": "x"}', b"[]"])
+def test_get_probe_repairs_corrupt_or_incomplete_persisted_probe(video, monkeypatch, persisted):
+    storage.save_stream(video_probe.PROBES, f"{video}.json", io.BytesIO(persisted))
+    calls = []
+    monkeypatch.setattr(video_probe, "_run_ffprobe", lambda i: calls.append(i) or _raw())
+
+    probe = get_probe(video)
+    assert probe["duration"] == 10.0
+    assert len(calls) == 1
+    # El probe reparado queda persistido y legible
+    video_probe._memory.clear()
+    assert get_probe(video) == probe
+    assert len(calls) == 1
+
+
+def test_memory_cache_is_bounded_and_file_locks_are_released(monkeypatch):
+    monkeypatch.setattr(video_probe, "PROBE_CACHE_MAX_ENTRIES", 2)
+    monkeypatch.setattr(video_probe, "_run_ffprobe", lambda i: _raw())
+    names = [f"lru_{i}.mp4" for i in range(3)]
+    for name in names:
+        storage.save_stream(VIDEOS, name, io.BytesIO(b"fake video"))
+    try:
+        for name in names:
+            get_probe(name)
+        assert list(video_probe._memory) == names[1:]
+        assert video_probe._file_locks == {}
+    finally:
+        for name in names:
+            forget_probe(name)
+            storage.delete(VIDEOS, name)
@@ -0,0 +1,106 @@
+import subprocess
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from routers import videos_router
+from services.frame_cache import LRUBytesCache
+
+PROBE = {"version": "v1", "duration": 10.0, "last_frame": 9.96, "keyframes": [0.0, 4.0, 8.0]}
+
+
+class _Calls(list):
+    """Comandos ffmpeg ejecutados + la salida simulada en `output`."""
+
+
+@pytest.fixture
+def ffmpeg_calls(monkeypatch):
+    calls = _Calls()
+    output = {"stdout": b"\xff\xd8jpeg", "returncode": 0}
+
+    def fake_run(cmd, capture_output=True):
+        calls.append(cmd)
+        return subprocess.CompletedProcess(cmd, output["returncode"], output["stdout"], b"")
+
+    monkeypatch.setattr(videos_router, "get_probe", lambda filename: dict(PROBE))
+    monkeypatch.setattr(videos_router.subprocess, "run", fake_run)
+    monkeypatch.setattr(videos_router, "frame_cache", LRUBytesCache(1024))
+    calls.output = output
+    return calls
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(videos_router.router)
+    return TestClient(app)
+
+
+def _arg(cmd, flag, occurrence=0):
+    idx = [i for i, a in enumerate(cmd) if a == flag][occurrence]
+    return cmd[idx + 1]
+
+
+def test_frame_returns_jpeg_with_etag(client, ffmpeg_calls):
+    r = client.get("/videos/v.mp4/frame", params={"t": 5.5, "w": 320})
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "image/jpeg"
+    assert r.content == b"\xff\xd8jpeg"
+    assert r.headers["etag"].startswith('"')
+    # Sin max-age: el navegador/CDN debe revalidar el ETag en cada uso
+    assert r.headers["cache-control"] == "public, no-cache"
+
+    cmd = ffmpeg_calls[0]
+    assert float(_arg(cmd, "-ss", 0)) == 4.0   # keyframe anterior
+    assert float(_arg(cmd, "-ss", 1)) == pytest.approx(1.5)
+    assert _arg(cmd, "-vf") == "scale=320:-2"
+
+
+def test_if_none_match_returns_304_without_decoding(client, ffmpeg_calls):
+    etag = client.get("/videos/v.mp4/frame", params={"t": 5.5}).headers["etag"]
+    assert len(ffmpeg_calls) == 1
+
+    for header in (etag, f"W/{etag}", f'"otro", {etag}', "*"):
+        r = client.get("/videos/v.mp4/frame", params={"t": 5.5}, headers={"If-None-Match": header})
+        assert r.status_code == 304
+        assert r.headers["etag"] == etag
+    assert len(ffmpeg_calls) == 1
+
+
+def test_etag_depends_on_time_width_and_version(client, ffmpeg_calls, monkeypatch):
+    base = client.get("/videos/v.mp4/frame", params={"t": 5.5}).headers["etag"]
+    assert client.get("/videos/v.mp4/frame", params={"t": 5.6}).headers["etag"] != base
+    assert client.get("/videos/v.mp4/frame", params={"t": 5.5, "w": 320}).headers["etag"] != base
+
+    monkeypatch.setattr(videos_router, "get_probe", lambda filename: dict(PROBE, version="v2"))
+    r = client.get("/videos/v.mp4/frame", params={"t": 5.5}, headers={"If-None-Match": base})
+    assert r.status_code == 200
+    assert r.headers["etag"] != base
+
+
+def test_cached_frame_is_not_decoded_again(client, ffmpeg_calls):
+    client.get("/videos/v.mp4/frame", params={"t": 5.5})
+    client.get("/videos/v.mp4/frame", params={"t": 5.5})
+    assert len(ffmpeg_calls) == 1
+
+
+def test_t_at_duration_is_clamped_to_last_frame(client, ffmpeg_calls):
+    r = client.get("/videos/v.mp4/frame", params={"t": 10.0})
+    assert r.status_code == 200
+    cmd = ffmpeg_calls[0]
+    assert float(_arg(cmd, "-ss", 0)) == 8.0
+    assert float(_arg(cmd, "-ss", 1)) == pytest.approx(1.96)
+
+
+def test_t_beyond_duration_is_rejected(client, ffmpeg_calls):
+    assert client.get("/videos/v.mp4/frame", params={"t": 10.5}).status_code == 400
+    assert ffmpeg_calls == []
+
+
+def test_empty_ffmpeg_output_is_not_a_server_error(client, ffmpeg_calls):
+    ffmpeg_calls.output["stdout"] = b""
+    r = client.get("/videos/v.mp4/frame", params={"t": 5.5})
+    assert r.status_code == 422
+    assert "content-range" not in r.headers
+
+    ffmpeg_calls.output["returncode"] = 1
+    assert client.get("/videos/v.mp4/frame", params={"t": 5.5}).status_code == 500